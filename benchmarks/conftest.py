@@ -0,0 +1,75 @@
+"""Synthetic flyby fixtures for the benchmarks, which require pytest-benchmark."""
+
+import pytest
+
+from astropy import units as u
+from astropy import constants as const
+from astropy.utils import iers
+
+from poliastro.twobody.sampling import EpochsArray
+
+import numpy as np
+
+from sim import synthetic
+from sim.stations import dss34
+from sim.tracking import Tracking
+from sim.util import make_epochs
+
+iers.conf.auto_download = False
+
+SAMPLING = 60*u.s
+
+# post-encounter arcs from Canberra acquisition, for the station and fitter benchmarks
+ARCS = [1*u.hour, 6*u.hour, 1*u.day]
+
+# longer spans for the epoch and residual analysis benchmarks
+SPANS = [1*u.day, 5*u.day, 30*u.day]
+
+
+def arc_id(arc):
+    return f'{arc.value:g}{arc.unit}'
+
+
+@pytest.fixture(scope='session')
+def near_orbit():
+    return synthetic.near_orbit()
+
+
+@pytest.fixture(scope='session', params=ARCS, ids=arc_id)
+def arc(request):
+    """Epochs of a post-encounter tracking arc."""
+
+    start = Tracking.NEAR_CANBERRA_START.value
+    return make_epochs(start, start + request.param, SAMPLING)
+
+
+@pytest.fixture(scope='session')
+def arc_ephem(near_orbit, arc):
+    """Trajectory of the flyby over the arc."""
+    return near_orbit.to_ephem(EpochsArray(arc))
+
+
+@pytest.fixture(scope='session')
+def arc_doppler(arc, arc_ephem):
+    """Doppler simulated for Canberra with light-time lags, over all but the last epoch of the arc."""
+
+    r, rr, net_accel, station_accel = dss34.range_rate_accel(arc_ephem, arc[:-1])
+    lags = (net_accel + station_accel)*r/const.c
+    return (rr - lags)[:, np.newaxis]
+
+
+@pytest.fixture(scope='session', params=SPANS, ids=arc_id)
+def span(request):
+    """Start, end and sampling interval of a long tracking span."""
+
+    start = Tracking.NEAR_CANBERRA_START.value
+    return start, start + request.param, SAMPLING
+
+
+@pytest.fixture(scope='session')
+def oscillation(span):
+    """Epochs over a span, with a decaying oscillating residual of the kind seen post-encounter."""
+
+    epochs = make_epochs(*span)
+    hours = np.arange(len(epochs)) * SAMPLING.to_value(u.hour)
+    return epochs, 1e-2*np.exp(-hours/100)*np.sin(2*np.pi*hours/12)
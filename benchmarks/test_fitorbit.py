@@ -0,0 +1,42 @@
+"""Benchmarks of orbit fitting to simulated Doppler data"""
+
+from sim.fitorbit import OrbitFitter, TrajectoryCache
+from sim.stations import dss34
+
+
+def _fitter(orbit, max_iter=100):
+    return OrbitFitter(orbit, [dss34], max_iter=max_iter, cache=TrajectoryCache(maxsize=0))
+
+
+def test_doppler_residual(benchmark, near_orbit, arc, arc_doppler):
+    # a fit aborted after its first evaluation: propagation, station geometry and residual, all cold
+
+    def setup():
+        dss34.clear_cache()
+        return (_fitter(near_orbit, max_iter=1), arc[:-1], arc_doppler), {}
+
+    def evaluate(fitter, times, data):
+        fitter.fit_doppler_data(times, data)
+        return fitter
+
+    fitter = benchmark.pedantic(evaluate, setup=setup, rounds=10)
+    assert fitter.result.nfev == 1
+
+
+def test_doppler_residual_reuse(benchmark, near_orbit, arc, arc_doppler):
+    fitter = _fitter(near_orbit)
+    fitter.fit_doppler_data(arc[:-1], arc_doppler)
+    benchmark(fitter.doppler_residual, arc[:-1], 2*arc_doppler)
+
+
+def test_fit_doppler_data(benchmark, near_orbit, arc, arc_doppler):
+
+    def setup():
+        return (_fitter(near_orbit), arc[:-1], arc_doppler), {}
+
+    def fit(fitter, times, data):
+        fitter.fit_doppler_data(times, data)
+        return fitter
+
+    fitter = benchmark.pedantic(fit, setup=setup, rounds=3)
+    assert fitter.result.success
@@ -0,0 +1,33 @@
+"""Benchmarks of slicing and aligning observations over long spans"""
+
+from astropy import units as u
+
+import pytest
+
+from sim.observations import Observations
+from sim.util import make_timeline
+
+
+@pytest.fixture(scope='session')
+def observations(oscillation):
+    """Residual measurements over a span, alternating between two stations."""
+
+    epochs, residual = oscillation
+    stations = ['Canberra-34', 'Goldstone-24'] * (len(residual) // 2) + ['Canberra-34'] * (len(residual) % 2)
+    return Observations(epochs, stations, residual, kind='doppler_residual')
+
+
+def test_between(benchmark, observations):
+    times = observations.times
+    benchmark(observations.between, times[len(times)//4], times[3*len(times)//4])
+
+
+@pytest.mark.parametrize('how', ['interpolate', 'nearest'])
+def test_align(benchmark, observations, span, how):
+    start, end, _ = span
+    timeline = make_timeline(start, end, 7*u.min)
+    benchmark(observations.align, timeline, how=how, tolerance=5*u.min)
+
+
+def test_grid(benchmark, observations):
+    benchmark(observations.grid)
@@ -0,0 +1,25 @@
+"""Benchmarks of station range, range rate and acceleration computations"""
+
+import pytest
+
+from sim.stations import dss25, dss34, ssrAltair, ssrMillstone
+
+
+@pytest.mark.parametrize('station', [dss25, dss34, ssrAltair, ssrMillstone], ids=lambda s: s.name)
+def test_range_and_rates(benchmark, station, arc, arc_ephem):
+    rv = arc_ephem.rv()
+    benchmark(station.range_and_rates, rv, arc)
+
+
+def test_range_rate_accel(benchmark, arc, arc_ephem):
+    benchmark.pedantic(dss34.range_rate_accel, args=(arc_ephem, arc[:-1]),
+                       setup=dss34.clear_cache, rounds=10)
+
+
+def test_range_rate_accel_memoized(benchmark, arc, arc_ephem):
+    dss34.range_rate_accel(arc_ephem, arc[:-1])
+    benchmark(dss34.range_rate_accel, arc_ephem, arc[:-1])
+
+
+def test_range_rate_accel_epoch(benchmark, arc, arc_ephem):
+    benchmark(dss34.range_rate_accel, arc_ephem, arc[len(arc)//2])
@@ -0,0 +1,19 @@
+"""Benchmarks of epoch generation and residual analysis over long spans"""
+
+from sim.util import make_epochs, make_timeline, find_swings, find_rates
+
+
+def test_make_epochs(benchmark, span):
+    benchmark(make_epochs, *span)
+
+
+def test_make_timeline(benchmark, span):
+    benchmark(make_timeline, *span)
+
+
+def test_find_swings(benchmark, oscillation):
+    benchmark(find_swings, *oscillation)
+
+
+def test_find_rates(benchmark, oscillation):
+    benchmark(find_rates, *oscillation)
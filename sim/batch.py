@@ -0,0 +1,279 @@
+"""Batch simulation and fitting of flyby Doppler residuals over many configurations
+
+A flyby spec is a JSON object, or list of them, with entries
+
+    name        label for the flyby
+    spacecraft  Horizons id, for the reference state at epoch
+    epoch       reference epoch of the orbit
+    elements    optional a, ecc, inc, raan, argp, nu at epoch, instead of Horizons
+    stations    list of station configurations, each a Stations key or list of keys
+    windows     list of [start, end] tracking windows, end may be a duration from start
+    sampling    sampling interval
+    lags        lag variants to simulate: none, constant, lighttime, full or scaled:<factor>
+    var         optional constraint on a, ecc and inc, as for OrbitFitter
+
+Epochs are ISO times in TDB or Tracking member names, optionally offset, as in
+"ROSETTA05_PERIGEE - 3 d".  Durations and elements are astropy quantity strings.
+Each flyby, station configuration, window and lag variant makes one run.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from itertools import chain
+import json
+import re
+
+from astropy import units as u
+from astropy import constants as const
+from astropy.time import Time
+
+from poliastro.bodies import Earth
+from poliastro.frames import Planes
+from poliastro.twobody.orbit import Orbit
+from poliastro.twobody.sampling import EpochsArray
+
+import numpy as np
+
+from .fitorbit import OrbitFitter
+from .stations import Stations
+from .tracking import Tracking
+from .util import orbit_from_horizons, make_epochs, find_swings
+
+
+LAGS = ["none", "constant", "lighttime", "full"]
+
+CATALOGUE = [
+    {
+        "name": "NEAR",
+        "spacecraft": "NEAR",
+        "epoch": "NEAR_GOLDSTONE_END",
+        "stations": ["dss34"],
+        "windows": [["NEAR_CANBERRA_START", "5 d"], ["NEAR_CANBERRA_START", "30 d"]],
+        "sampling": "1 h",
+        "lags": LAGS + ["scaled:0.1"],
+    },
+    {
+        "name": "Rosetta 2005",
+        "spacecraft": "Rosetta",
+        "epoch": "ROSETTA05_PERIGEE - 5 d",
+        "stations": ["newnorcia", "dss24"],
+        "windows": [["ROSETTA05_PERIGEE - 5 d", "9 d"]],
+        "sampling": "1 h",
+        "lags": LAGS,
+    },
+    {
+        "name": "Rosetta 2007",
+        "spacecraft": "Rosetta",
+        "epoch": "ROSETTA07_NEWNORCIA_END - 2 d",
+        "stations": ["newnorcia", "dss24"],
+        "windows": [["ROSETTA07_NEWNORCIA_END - 2 d", "ROSETTA07_NEWNORCIA_END"],
+                    ["ROSETTA07_GOLDSTONE24_START", "2 d"]],
+        "sampling": "10 min",
+        "lags": LAGS,
+    },
+    {
+        "name": "Rosetta 2009",
+        "spacecraft": "Rosetta",
+        "epoch": "ROSETTA09_NEWNORCIA_START",
+        "stations": ["newnorcia"],
+        "windows": [["ROSETTA09_NEWNORCIA_START", "ROSETTA09_NEWNORCIA_END"]],
+        "sampling": "10 s",
+        "lags": LAGS,
+    },
+]
+
+_TRACKED = re.compile(r'^\s*(\w+)\s*(?:([+-])\s*(.+))?$')
+
+ELEMENTS = {'a': u.km, 'ecc': u.one, 'inc': u.deg, 'raan': u.deg, 'argp': u.deg, 'nu': u.deg}
+
+
+def parse_epoch(text):
+    """Epoch from an ISO time in TDB, or a Tracking member name optionally offset by a duration."""
+
+    m = _TRACKED.match(text)
+    if m and m.group(1) in Tracking.__members__:
+        epoch = Tracking[m.group(1)].value
+        if m.group(2):
+            offset = u.Quantity(m.group(3))
+            epoch = epoch + offset if m.group(2) == '+' else epoch - offset
+        return epoch
+    return Time(text, scale='tdb')
+
+
+def parse_end(start, text):
+    """Window end, as an epoch or a duration from start."""
+    try:
+        return start + u.Quantity(text).to(u.s)
+    except (TypeError, ValueError):
+        return parse_epoch(text)
+
+
+def check_lag(lag):
+    """Check a lag variant is one of LAGS or scaled:<factor>, raising ValueError if not."""
+
+    if lag in LAGS:
+        return
+    if lag.startswith("scaled:"):
+        try:
+            float(lag[len("scaled:"):])
+            return
+        except ValueError:
+            pass
+    raise ValueError(f"Unknown lag variant {lag}")
+
+
+def expand(spec):
+    """Runs of a flyby spec, one per flyby, station configuration, window and lag variant, checking the lags."""
+
+    runs = []
+    for flyby in spec if isinstance(spec, list) else [spec]:
+        for lag in flyby.get("lags", ["lighttime"]):
+            check_lag(lag)
+        for stations in flyby["stations"]:
+            stations = [stations] if isinstance(stations, str) else list(stations)
+            for window in flyby["windows"]:
+                for lag in flyby.get("lags", ["lighttime"]):
+                    run = {k: v for k, v in flyby.items() if k not in ("stations", "windows", "lags")}
+                    run.update(stations=stations, window=list(window), lag=lag)
+                    runs.append(run)
+    return runs
+
+
+def reference_orbit(spacecraft, epoch):
+    """Reference orbit from Horizons."""
+    return orbit_from_horizons(spacecraft, parse_epoch(epoch))
+
+
+def elements(orbit):
+    """Classical elements of an orbit, as exact quantity strings for a run."""
+    return {k: f"{getattr(orbit, k).to_value(unit)!r} {unit}" for k, unit in ELEMENTS.items()}
+
+
+def resolve(runs):
+    """
+    Runs with the reference orbit of each flyby queried from Horizons once and given as elements,
+    so that every run of a flyby starts from the same state and workers need no network access.
+    Runs whose query fails are given its error instead.
+    """
+
+    orbits = {}
+    resolved = []
+    for r in runs:
+        if "elements" in r:
+            resolved.append(r)
+            continue
+
+        flyby = (r["spacecraft"], r["epoch"])
+        if flyby not in orbits:
+            try:
+                orbits[flyby] = {"elements": elements(reference_orbit(*flyby))}
+            except Exception as e:  # pylint: disable=broad-except
+                orbits[flyby] = {"error": f"{type(e).__name__}: {e}", "runtime": 0.0}
+        resolved.append(dict(r, **orbits[flyby]))
+    return resolved
+
+
+def _orbit(run):
+    if "elements" not in run:
+        return reference_orbit(run["spacecraft"], run["epoch"])
+
+    elements = {k: u.Quantity(run["elements"][k]).to(unit) for k, unit in ELEMENTS.items()}
+    return Orbit.from_classical(attractor=Earth, epoch=parse_epoch(run["epoch"]), plane=Planes.EARTH_EQUATOR,
+                                **elements)
+
+
+def simulate(stations, ephem, epochs, lag):
+    """Doppler simulated for the stations over the trajectory, with a lag variant, as m/s per epoch and station."""
+
+    check_lag(lag)
+    data = np.empty((len(epochs), len(stations)))
+    for si, station in enumerate(stations):
+        r, rr, net_accel, station_accel = station.range_rate_accel(ephem, epochs)
+        vlag = ((net_accel + station_accel)*r/const.c).to_value(u.m/u.s)
+        rr = rr.to_value(u.m/u.s)
+
+        if lag == "none":
+            data[:, si] = rr
+        elif lag == "constant":
+            data[:, si] = rr - vlag[0]
+        elif lag == "lighttime":
+            data[:, si] = rr - vlag
+        elif lag == "full":
+            data[:, si] = rr - (net_accel*r/const.c).to_value(u.m/u.s)
+        else:
+            data[:, si] = rr - float(lag[len("scaled:"):])*vlag
+    return data
+
+
+def summarize(epochs, residual):
+    """Summary of a Doppler residual in m/s, and its swings."""
+
+    summary = {
+        "rms": float(np.sqrt(np.mean(np.square(residual)))),
+        "max": float(np.max(np.abs(residual))),
+        "swings": 0,
+    }
+    try:
+        _, heights = find_swings(epochs, residual)
+    except ValueError:
+        return summary
+
+    summary.update(swings=len(heights), swing_mean=float(np.mean(heights)), swing_last=float(heights[-1]))
+    return summary
+
+
+def run(config):
+    """Simulate and fit one run, returning its record of results."""
+
+    record = dict(config)
+    started = datetime.now()
+    try:
+        orbit = _orbit(config)
+        stations = [Stations[s] for s in config["stations"]]
+
+        start = parse_epoch(config["window"][0])
+        end = parse_end(start, config["window"][1])
+        epochs = make_epochs(start, end, u.Quantity(config["sampling"]))
+        ephem = orbit.to_ephem(EpochsArray(epochs))
+
+        times = epochs[:-1]
+        data = simulate(stations, ephem, times, config["lag"])
+
+        fitter = OrbitFitter(orbit, stations, var=config.get("var", 0.001))
+        fitter.fit_doppler_data(times, data)
+        result = fitter.result
+
+        # residual per epoch, across stations
+        residual = np.reshape(result.residual, (len(times), len(stations)))
+        record.update(
+            start=start.tdb.isot,
+            end=end.tdb.isot,
+            epochs=len(times),
+            success=bool(result.success),
+            nfev=int(result.nfev),
+            chisqr=float(result.chisqr),
+            redchi=float(result.redchi),
+            fitted={k: float(v) for k, v in result.params.valuesdict().items()},
+            residual={sv.name: summarize(times, residual[:, si]) for si, sv in enumerate(stations)},
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        record.update(error=f"{type(e).__name__}: {e}")
+
+    record.update(runtime=(datetime.now() - started).total_seconds())
+    return record
+
+
+def survey(runs, store, jobs=None):
+    """
+    Run all runs in a pool of jobs worker processes, appending their records to the store as JSON lines.
+    Reference orbits are resolved before the runs are submitted.
+    """
+
+    runs = resolve(runs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool, open(store, "a", encoding="utf-8") as out:
+        futures = [pool.submit(run, r) for r in runs if "error" not in r]
+        failed = [r for r in runs if "error" in r]
+        for record in chain(failed, (future.result() for future in as_completed(futures))):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            yield record
@@ -1,6 +1,9 @@
 """Least square fit of orbital elements under a perturbation"""
 
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+from multiprocessing import Pool
+import os
 
 from astropy import units as u
 
@@ -12,15 +15,202 @@ from poliastro.twobody.sampling import EpochsArray
 
 from lmfit import Parameters, minimize, fit_report
 
+from scipy.optimize import differential_evolution
+
 import numpy as np
 
+from .observations import Observations
+from .timeline import as_timeline
+
+
+OBSERVABLES = ['range', 'doppler']    # order of the observables in the model
+
+
+def measurements(data, unit):
+    """Nested per-epoch, per-station measurements as a float array in unit, missing ones as NaN."""
+
+    try:
+        return u.Quantity(data, unit).value
+    except (TypeError, ValueError, u.UnitsError):
+        return np.array([[u.Quantity(x, unit).value for x in datum] for datum in data], dtype=float)
+
+
+def orbit_from_elements(vals, epoch):
+    """Orbit from a, ecc, inc, raan, argp and nu values in m and rad at epoch."""
+
+    return Orbit.from_classical(attractor = Earth,
+                                a=vals['a'] * u.m,
+                                ecc=vals['ecc'] * u.one,
+                                inc=vals['inc'] * u.rad,
+                                raan=vals['raan'] * u.rad,
+                                argp=vals['argp'] * u.rad,
+                                nu=vals['nu'] * u.rad,
+                                epoch = epoch,
+                                plane = Planes.EARTH_EQUATOR)
+
+
+def _weighted(model, meas, wts):
+    """
+    Residual of model from measurements per epoch and station, weighted per epoch or per epoch and station,
+    zero where unmeasured.
+    """
+
+    n = len(meas)
+    wt = np.ones(meas.shape)
+    if wts is not None:
+        wts = np.asarray(wts, dtype=float)
+        k = min(len(wts), n)
+        wt[:k] = wts[:k] if wts.ndim == 2 else wts[:k, np.newaxis]
+
+    rres = (model - meas) * wt
+    rres[np.isnan(meas)] = 0
+    return rres.ravel()
+
+
+class DopplerCost:
+    """
+    Sum of squared Doppler residuals as a function of the orbital element values, for global search.
+    Holds the fixed epochs, measurements and stations, whose geometry memos travel with them to worker processes.
+    """
+
+    def __init__(self, stations, epoch, timeline, meas, wts, names):
+        self._stations = stations
+        self._epoch = epoch
+        self._timeline = timeline
+        self._meas = meas
+        self._wts = wts
+        self._names = names
+
+    def residual(self, values):
+        """Weighted Doppler residual in m/s for element values ordered as names."""
+
+        orbit = orbit_from_elements(dict(zip(self._names, values)), self._epoch)
+        ephem = orbit.to_ephem(EpochsArray(self._timeline.to_time()))
+        model = np.stack([sv.observe(ephem, self._timeline)[1] for sv in self._stations], axis=1)
+        return _weighted(model, self._meas, self._wts)
+
+    def __call__(self, values):
+        try:
+            return float(np.sum(np.square(self.residual(values))))
+        except ValueError:
+            # elements outside the valid range, such as nu beyond the asymptotes of a hyperbola
+            return np.inf
+
+
+_search_cost = None
+
+
+def _init_search(cost):
+    global _search_cost     # pylint: disable=global-statement
+    _search_cost = cost
+
+
+def _search_eval(values):
+    return _search_cost(values)
+
+
+class Trajectory:
+    """Orbit propagated over an epoch grid, with station observables memoized against it."""
+
+    def __init__(self, orbit, ephem):
+        self.orbit = orbit
+        self.ephem = ephem
+        self.observables = {}
+
+    @property
+    def nbytes(self):
+        """Approximate memory held: epochs and position, velocity states, and observables"""
+        return 64*len(self.ephem.epochs) + sum(v.nbytes for v in self.observables.values())
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'nbytes'])
+
+
+class TrajectoryCache:
+    """Bounded LRU cache of trajectories, keyed by quantized orbital elements, epoch and epoch grid."""
+
+    def __init__(self, maxsize=256, max_bytes=256*1024*1024, digits=12):
+        """Limits on entries and approximate memory, and significant digits kept of the elements."""
+
+        self._maxsize = maxsize
+        self._max_bytes = max_bytes
+        self._digits = digits
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, elements, epoch, times_key):
+        """Cache key for element values propagated from epoch over the timeline hashed as times_key."""
+        quantized = tuple(float(f'{v:.{self._digits}g}') for v in elements)
+        return quantized, float(epoch.jd1), float(epoch.jd2), epoch.scale, times_key
+
+    def get(self, key):
+        """Cached trajectory, or None on a miss."""
+        trajectory = self._entries.get(key)
+        if trajectory is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return trajectory
+
+    def put(self, key, trajectory):
+        """Add a trajectory, evicting the least recently used beyond the limits."""
+        if self._maxsize > 0:
+            self._entries[key] = trajectory
+            self._entries.move_to_end(key)
+            self._resize(key)
+
+    def update(self, key):
+        """Account for a cached trajectory grown by memoized observables, evicting beyond the limits."""
+        if key in self._entries:
+            self._resize(key)
+
+    def _resize(self, key):
+        size = self._entries[key].nbytes
+        self._nbytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+        self.trim()
+
+    def trim(self):
+        """Evict least recently used entries until within the limits."""
+        while self._entries and (len(self._entries) > self._maxsize or self._nbytes > self._max_bytes):
+            key, _ = self._entries.popitem(last=False)
+            self._nbytes -= self._sizes.pop(key)
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        self._entries.clear()
+        self._sizes.clear()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the cached trajectories"""
+        return self._nbytes
+
+    def info(self):
+        """Hit and miss counts, limit and current size."""
+        return CacheInfo(self.hits, self.misses, self._maxsize, len(self._entries), self.nbytes)
+
+
+trajectory_cache = TrajectoryCache()
+
+
 class OrbitFitter:
     """Fitter of poliastro orbits to range or Doppler data"""
 
     # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, orbit, stations, var=0.001, max_iter=100, trace=False, debug=False):
-        """Reference orbit and tracking stations to which the perturbations must be minimized."""
+    def __init__(self, orbit, stations, var=0.001, max_iter=100, trace=False, debug=False, cache=None):
+        """
+        Reference orbit and tracking stations to which the perturbations must be minimized.
+        Trajectories are reused from cache, by default the shared trajectory_cache.
+        """
 
         self._debug = debug
         self._trace = trace
@@ -59,13 +249,15 @@ class OrbitFitter:
         self._epoch = orbit.epoch
         self._maxiter = max_iter
         self._runtime = None
+        self._cache = trajectory_cache if cache is None else cache
 
         # computed by fitting
-        self._orbit = None
-        self._ephem = None
+        self._trajectory = None
+        self._trajectory_key = None
         self._result = None
         self._params = []
         self._resid = []
+        self._search = None
 
 
     def param(self, name):
@@ -84,12 +276,22 @@ class OrbitFitter:
     @property
     def orbit(self):
         """Last orbital elements visited by fit"""
-        return self._orbit
+        return self._trajectory.orbit if self._trajectory else None
 
     @property
     def ephem(self):
         """Last ephemeris generated by fit"""
-        return self._ephem
+        return self._trajectory.ephem if self._trajectory else None
+
+    @property
+    def cache(self):
+        """Trajectory cache used by this fitter"""
+        return self._cache
+
+    @property
+    def search(self):
+        """Differential evolution result of the last global search, with the reference and candidate starts polished"""
+        return self._search
 
     @property
     def runtime(self):
@@ -105,7 +307,7 @@ class OrbitFitter:
 
         if self._debug:
             _norm = "()"
-            if resid:
+            if resid is not None and len(resid):
                 _norm = norm(resid*u.one)
             print(f'{iternum}. {_norm} {params.valuesdict()}')
 
@@ -115,56 +317,59 @@ class OrbitFitter:
         return False
 
 
-    def range_residual(self, times, data, wts=None):
-        rres = []
-        for i, e in enumerate(times):
-            rv = self._ephem.rv(e)
-            datum = data[i]
-            if wts is None or i >= len(wts):
-                wt = 1
-            else:
-                wt = wts[i]
+    def _model(self, timeline):
+        """Model range and range rate as m and m/s over a timeline, memoized with the current trajectory."""
+
+        key = (timeline.key, tuple(sv.name for sv in self._stations))
+        model = self._trajectory.observables.get(key)
+        if model is None:
+            model = np.empty((len(timeline), len(self._stations), 2))
             for si, sv in enumerate(self._stations):
-                meas_r = datum[si]
-                if np.isnan(meas_r):
-                    rres.append(0)
-                else:
-                    model_r, _ = sv.range_and_rate(rv, e)
-                    rres.append((model_r - meas_r).to_value(u.m)*wt)
-        return rres
+                r, rr, _ = sv.observe(self._trajectory.ephem, timeline)
+                model[:, si, 0] = r
+                model[:, si, 1] = rr
+            self._trajectory.observables[key] = model
+            self._cache.update(self._trajectory_key)
+        return model
+
+    def _residual(self, times, data, wts, index, unit):
+        timeline = as_timeline(times)
+        meas = measurements(data, unit)[:len(timeline)]
+        return _weighted(self._model(timeline)[:, :, index], meas, wts)
+
+    def range_residual(self, times, data, wts=None):
+        return self._residual(times, data, wts, 0, u.m)
 
     def doppler_residual(self, times, data, wts=None):
-        rres = []
-        for i, e in enumerate(times):
-            rv = self._ephem.rv(e)
-            datum = data[i]
-            if wts is None or i >= len(wts):
-                wt = 1
-            else:
-                wt = wts[i]
-            for si, sv in enumerate(self._stations):
-                meas_rr = datum[si]
-                if np.isnan(meas_rr):
-                    rres.append(0)
-                else:
-                    _, model_rr = sv.range_and_rate(rv, e)
-                    rres.append((model_rr - meas_rr).to_value(u.m/u.s)*wt)
-        return rres
+        return self._residual(times, data, wts, 1, u.m/u.s)
+
+
+    def observations_residual(self, obs):
+        """Residual of the current trajectory from range or doppler Observations, as Observations."""
+
+        if obs.kind not in ('range', 'doppler'):
+            raise ValueError(f"Cannot compute residual of {obs.kind} observations")
 
+        timeline, data, wts = obs.grid(self._stations)
+        resid = self._residual(timeline, data, wts, OBSERVABLES.index(obs.kind), obs.unit)
+        resid = np.reshape(resid, data.shape)
+        resid[np.isnan(data)] = np.nan
+        return Observations.from_grid(timeline, self._stations, resid, wts, obs.kind + '_residual')
 
-    def _compute_trajectory(self, params, times):
+
+    def _compute_trajectory(self, params, timeline):
         vals = params.valuesdict()
+        times = timeline.to_time()
+        epoch = min(self._epoch, times[0])
 
-        self._orbit = Orbit.from_classical(attractor = Earth,
-                                     a=vals['a'] * u.m,
-                                     ecc=vals['ecc'] * u.one,
-                                     inc=vals['inc'] * u.rad,
-                                     raan=vals['raan'] * u.rad,
-                                     argp=vals['argp'] * u.rad,
-                                     nu=vals['nu'] * u.rad,
-                                     epoch = min(self._epoch, times[0]),
-                                     plane = Planes.EARTH_EQUATOR)
-        self._ephem = self._orbit.to_ephem(EpochsArray(times))
+        key = self._cache.key(vals.values(), epoch, timeline.key)
+        trajectory = self._cache.get(key)
+        if trajectory is None:
+            orbit = orbit_from_elements(vals, epoch)
+            trajectory = Trajectory(orbit, orbit.to_ephem(EpochsArray(times)))
+            self._cache.put(key, trajectory)
+        self._trajectory = trajectory
+        self._trajectory_key = key
 
 
     def _range_residual(self, params, times, data, wts=None):
@@ -183,7 +388,8 @@ class OrbitFitter:
 
         started = datetime.now()
         self._result = minimize(res_func, self._ref_params,
-            args=(times,), kws={'dats': data, 'wts': weights}, iter_cb=tr_func, method=method)
+            args=(as_timeline(times),), kws={'dats': measurements(data, u.m), 'wts': weights},
+            iter_cb=tr_func, method=method)
         self._runtime = datetime.now() - started
 
 
@@ -192,8 +398,8 @@ class OrbitFitter:
         return self.doppler_residual(times, data, wts)
 
 
-    def fit_doppler_data(self, times, data, weights=None, method='leastsq'):
-        """Method to fit orbital elements to doppler or range-rate data"""
+    def fit_doppler_data(self, times, data, weights=None, method='leastsq', params=None):
+        """Method to fit orbital elements to doppler or range-rate data, from params if given else the reference"""
 
         def res_func(pars, times, dats, wts):
             return self._doppler_residual(pars, times, dats, wts)
@@ -202,19 +408,90 @@ class OrbitFitter:
             return self._iter_trace(iternum, pars, resid)
 
         started = datetime.now()
-        self._result = minimize(res_func, self._ref_params,
-            args=(times,), kws={'dats': data, 'wts': weights}, iter_cb=tr_func, method=method)
+        self._result = minimize(res_func, self._ref_params if params is None else params,
+            args=(as_timeline(times),), kws={'dats': measurements(data, u.m/u.s), 'wts': weights},
+            iter_cb=tr_func, method=method)
         self._runtime = datetime.now() - started
 
 
+    def fit_observations(self, obs, method='leastsq'):
+        """Method to fit orbital elements to range or doppler Observations of the fitter's stations"""
+
+        timeline, data, wts = obs.grid(self._stations)
+        if obs.kind == 'range':
+            self.fit_range_data(timeline, data, wts, method)
+        elif obs.kind == 'doppler':
+            self.fit_doppler_data(timeline, data, wts, method)
+        else:
+            raise ValueError(f"Cannot fit {obs.kind} observations")
+
+
     def fit_rangerates_to_range_data(self, times, rdata, weights=None, method='leastsq'):
         """Method to fit orbital elements to the range rates implied by range data"""
 
-        rrdata = []
-        for i, t in enumerate(times[1:]):
-            dt = t - times[i-1]
-            nowr = rdata[i]
-            wasr = rdata[i-1]
-            rrdata.append([ (nowr[si] - wasr[si])/dt for si, sv in enumerate(self._stations) ])
+        timeline = as_timeline(times)
+        secs = timeline.seconds
+        r = measurements(rdata, u.m)
+
+        i = np.arange(len(secs) - 1)
+        rrdata = (r[i] - r[i-1]) / (secs[i+1] - secs[i-1])[:, np.newaxis]
+
+        self.fit_doppler_data(timeline[:-1], rrdata, weights, method)
+
 
-        self.fit_doppler_data(times[:-1], rrdata, weights, method)
+    def search_doppler_data(self, times, data, weights=None, method='leastsq', workers=None, candidates=3,
+                            popsize=15, maxiter=100, seed=None):
+        """
+        Global search for orbital elements fitting doppler or range-rate data, by differential evolution over
+        the parameter bounds with each population evaluated in parallel worker processes. The reference elements
+        and the best distinct candidates found are then polished by fitting from each with method, and the best fit
+        is kept, so that it is never worse than that of fit_doppler_data from the reference elements.
+        """
+
+        started = datetime.now()
+        timeline = as_timeline(times)
+        meas = measurements(data, u.m/u.s)[:len(timeline)]
+
+        names = list(self._ref_params)
+        bounds = [(self._ref_params[k].min, self._ref_params[k].max) for k in names]
+        x0 = [self._ref_params[k].value for k in names]
+        epoch = min(self._epoch, timeline.to_time()[0])
+
+        # evaluated once here to compile the propagator and memoize the station geometry before the workers start
+        cost = DopplerCost(self._stations, epoch, timeline, meas, weights, names)
+        cost(x0)
+
+        with Pool(workers or os.cpu_count(), initializer=_init_search, initargs=(cost,)) as pool:
+
+            def evaluate(_func, population):
+                # the cost is already installed in each worker
+                return pool.map(_search_eval, population)
+
+            found = differential_evolution(cost, bounds, x0=x0, workers=evaluate, updating='deferred',
+                                           polish=False, popsize=popsize, maxiter=maxiter, seed=seed)
+
+        population = getattr(found, 'population', [found.x])
+        energies = getattr(found, 'population_energies', [found.fun])
+        # the reference elements first, as differential evolution may have replaced them in the population
+        starts = [np.asarray(x0)]
+        for i in np.argsort(energies):
+            if len(starts) > candidates or not np.isfinite(energies[i]):
+                break
+            if not any(np.allclose(population[i], x) for x in starts):
+                starts.append(population[i])
+
+        best, best_cost = None, np.inf
+        for x in starts:
+            params = self._ref_params.copy()
+            for k, v in zip(names, x):
+                params[k].value = v
+            self.fit_doppler_data(timeline, meas, weights, method, params)
+            polished = cost([self._result.params[k].value for k in names])
+            if best is None or polished < best_cost:
+                best, best_cost = self._result, polished
+
+        self._result = best
+        self._compute_trajectory(best.params, timeline)
+        self._search = found
+        self._search.candidates = starts
+        self._runtime = datetime.now() - started
@@ -0,0 +1,256 @@
+"""Array-backed tracking observations
+
+Observations hold the measurements of any number of stations as flat arrays sorted by epoch,
+with the epochs as a Timeline, so that slicing by time and alignment to model epochs are array
+operations.  The values are floats in the unit of the measurement type, m or m/s.
+"""
+
+import csv
+
+from astropy import units as u
+from astropy.time import Time
+
+import numpy as np
+
+from .timeline import Timeline, as_timeline
+
+
+UNITS = {
+    'range': u.m,
+    'doppler': u.m/u.s,
+    'range_residual': u.m,
+    'doppler_residual': u.m/u.s,
+}
+
+FIELDS = ['epoch', 'scale', 'station', 'kind', 'value', 'weight']
+
+
+def _name(station):
+    return getattr(station, 'name', station)
+
+
+class Observations:
+    """Measurements from tracking stations, held as arrays sorted by epoch."""
+
+    def __init__(self, epochs, stations, values, weights=None, kind='doppler'):
+        """
+        Epochs as Time or Timeline, with the station names or Station objects, values and optional weights
+        of each measurement. A single station applies to all. Values may be quantities or floats in the unit of kind.
+        """
+
+        if kind not in UNITS:
+            raise ValueError(f"Unknown measurement type {kind}")
+
+        timeline = as_timeline(epochs)
+        values = np.atleast_1d(u.Quantity(values, UNITS[kind]).value)
+        if isinstance(stations, str) or not np.iterable(stations):
+            stations = [stations] * len(values)
+        stations = np.array([_name(s) for s in stations], dtype=str)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+
+        if not len(timeline) == len(stations) == len(values) == len(weights):
+            raise ValueError("Epochs, stations, values and weights differ in length")
+
+        order = np.argsort(timeline.seconds, kind='stable')
+        self._epochs = timeline[order]
+        self._stations = stations[order]
+        self._values = values[order]
+        self._weights = weights[order]
+        self._kind = kind
+
+    @classmethod
+    def from_dicts(cls, data, kind):
+        """Observations from a dict of station names to dicts of epochs to values, as in SSNdata."""
+
+        stations = [name for name, values in data.items() for _ in values]
+        epochs = Time([e for values in data.values() for e in values])
+        values = [v for values in data.values() for v in values.values()]
+        return cls(epochs, stations, values, kind=kind)
+
+    @classmethod
+    def from_grid(cls, epochs, stations, values, weights=None, kind='doppler'):
+        """Observations from per-epoch, per-station values as laid out for OrbitFitter, omitting NaN."""
+
+        timeline = as_timeline(epochs)
+        values = u.Quantity(values, UNITS[kind]).value
+        rows, cols = np.nonzero(~np.isnan(values))
+        names = np.array([_name(s) for s in stations], dtype=str)
+        return cls(timeline[rows], names[cols], values[rows, cols],
+                   None if weights is None else np.asarray(weights)[rows, cols], kind)
+
+    def _subset(self, index):
+        sub = Observations.__new__(Observations)
+        sub._epochs = self._epochs[index]
+        sub._stations = self._stations[index]
+        sub._values = self._values[index]
+        sub._weights = self._weights[index]
+        sub._kind = self._kind
+        return sub
+
+    @property
+    def epochs(self):
+        """Epochs of the measurements, as a Timeline"""
+        return self._epochs
+
+    @property
+    def times(self):
+        """Epochs of the measurements, as Time"""
+        return self._epochs.to_time()
+
+    @property
+    def stations(self):
+        """Station name of each measurement"""
+        return self._stations
+
+    @property
+    def station_names(self):
+        """Distinct station names, in order of first measurement"""
+        names, first = np.unique(self._stations, return_index=True)
+        return list(names[np.argsort(first)])
+
+    @property
+    def values(self):
+        """Measured values, in unit"""
+        return self._values
+
+    @property
+    def quantity(self):
+        """Measured values as a Quantity"""
+        return self._values * self.unit
+
+    @property
+    def weights(self):
+        """Weight of each measurement"""
+        return self._weights
+
+    @property
+    def kind(self):
+        """Measurement type: range, doppler, range_residual or doppler_residual"""
+        return self._kind
+
+    @property
+    def unit(self):
+        """Unit of the values"""
+        return UNITS[self._kind]
+
+    def __len__(self):
+        return len(self._values)
+
+    def _seconds(self, epochs):
+        """Seconds of epochs from the reference of these observations."""
+        return as_timeline(epochs).seconds_from(self._epochs.reference)
+
+    def between(self, start, end):
+        """Measurements from start up to and excluding end."""
+        secs = self._epochs.seconds
+        lo, hi = np.searchsorted(secs, self._seconds(Time([start, end])))
+        return self._subset(slice(lo, hi))
+
+    def select(self, stations):
+        """Measurements of the given station names or Station objects."""
+        return self._subset(np.isin(self._stations, [_name(s) for s in stations]))
+
+    def by_station(self):
+        """Pairs of station name and its measurements."""
+        return [(name, self._subset(self._stations == name)) for name in self.station_names]
+
+    def align(self, epochs, stations=None, how='interpolate', tolerance=None):
+        """
+        Values at epochs per station, as a per-epoch, per-station float array for OrbitFitter, NaN where unavailable.
+        Values are linearly interpolated, or taken from the nearest measurement if how is 'nearest',
+        and in either case only within tolerance, a time Quantity, of the nearest measurement if given.
+        """
+
+        if how not in ('interpolate', 'nearest'):
+            raise ValueError(f"Unknown alignment {how}")
+
+        names = self.station_names if stations is None else [_name(s) for s in stations]
+        target = self._seconds(epochs)
+        aligned = np.full((len(target), len(names)), np.nan)
+
+        for si, name in enumerate(names):
+            mask = self._stations == name
+            secs = self._epochs.seconds[mask]
+            values = self._values[mask]
+            if len(secs) == 0:
+                continue
+
+            # neighbouring measurements either side of each target epoch, the same one if only one
+            right = np.clip(np.searchsorted(secs, target), 1, max(len(secs)-1, 1)) % len(secs)
+            left = np.maximum(right - 1, 0)
+            nearest = np.where(np.abs(target - secs[left]) <= np.abs(secs[right] - target), left, right)
+
+            if how == 'nearest':
+                column = values[nearest]
+            else:
+                column = np.interp(target, secs, values, left=np.nan, right=np.nan)
+
+            if tolerance is not None:
+                column[np.abs(secs[nearest] - target) > tolerance.to_value(u.s)] = np.nan
+            aligned[:, si] = column
+
+        return aligned
+
+    def grid(self, stations=None):
+        """
+        Distinct epochs as a Timeline, with the per-epoch, per-station values and weights laid out for OrbitFitter,
+        NaN and zero where a station has no measurement. Stations may share epochs, but not measure twice at one.
+        """
+
+        names = self.station_names if stations is None else [_name(s) for s in stations]
+        secs, first, rows = np.unique(self._epochs.seconds, return_index=True, return_inverse=True)
+
+        values = np.full((len(secs), len(names)), np.nan)
+        weights = np.zeros((len(secs), len(names)))
+        for si, name in enumerate(names):
+            mask = self._stations == name
+            if len(np.unique(rows[mask])) < np.count_nonzero(mask):
+                raise ValueError(f"Multiple measurements of {name} at an epoch")
+            values[rows[mask], si] = self._values[mask]
+            weights[rows[mask], si] = self._weights[mask]
+
+        return self._epochs[first], values, weights
+
+    def save(self, file):
+        """Save as CSV if file ends with .csv, else as npz, keeping the time scale of the epochs."""
+
+        times = self.times
+        if str(file).endswith('.csv'):
+            epochs = Time(times, precision=9).isot if len(self) else []
+            with open(file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(FIELDS)
+                for row in zip(epochs, [times.scale] * len(self), self._stations, [self._kind] * len(self),
+                               self._values, self._weights):
+                    writer.writerow(row)
+            return
+
+        ref = self._epochs.reference
+        np.savez_compressed(file, reference=[ref.tdb.jd1, ref.tdb.jd2], scale=times.scale,
+                            seconds=self._epochs.seconds, stations=self._stations,
+                            values=self._values, weights=self._weights, kind=self._kind)
+
+    @classmethod
+    def load(cls, file):
+        """Load from CSV if file ends with .csv, else from npz, as saved."""
+
+        if str(file).endswith('.csv'):
+            with open(file, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            kinds = {r['kind'] for r in rows}
+            scales = {r['scale'] for r in rows}
+            if len(kinds) > 1 or len(scales) > 1:
+                raise ValueError(f"Mixed measurement types {kinds} or time scales {scales} in {file}")
+            if not rows:
+                raise ValueError(f"No measurements in {file}")
+            return cls(Time([r['epoch'] for r in rows], scale=scales.pop()),
+                       [r['station'] for r in rows],
+                       np.array([r['value'] for r in rows], dtype=float),
+                       np.array([r['weight'] for r in rows], dtype=float),
+                       kinds.pop())
+
+        with np.load(file) as npz:
+            ref = Time(*npz['reference'], format='jd', scale='tdb')
+            ref = getattr(ref, str(npz['scale']))
+            return cls(Timeline(ref, npz['seconds']), npz['stations'], npz['values'], npz['weights'],
+                       str(npz['kind']))
@@ -4,6 +4,8 @@
 from enum import Enum
 from astropy.time import Time
 
+from .observations import Observations
+
 class SSNdata(Enum):
     """
     See https://github.com/earthshrink/flyby-analysis/blob/refine_estimates/near/near_ssn.tex
@@ -57,3 +59,9 @@ class SSNdata(Enum):
                 Time("1998-01-23 06:51.05"): -444 ,
                 Time("1998-01-23 06:51.54"): -454
                 }
+
+
+def ssn_observations():
+    """SSN range residuals of Millstone and Altair, in m, as Observations."""
+    return Observations.from_dicts({"Millstone": SSNdata.MILLSTONE.value, "Altair": SSNdata.ALTAIR.value},
+                                   'range_residual')
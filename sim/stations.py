@@ -12,6 +12,8 @@ SSN Millstone
 DSN coordinates directly from JPL Horizons web interface.
 """
 
+from collections import OrderedDict
+
 from astropy import units as u
 from astropy import constants as const
 from astropy.time import Time
@@ -23,6 +25,30 @@ from poliastro.bodies import Earth
 import json
 import math
 
+import numpy as np
+
+from .timeline import Timeline, as_timeline
+
+
+GEOMETRY_SIZE = 4                   # timelines of station positions and velocities memoized per station
+GEOMETRY_BYTES = 64*1024*1024       # and the memory they may hold per station
+
+
+def _topocentric(r, v, loc, vel):
+    """Range, range rate and station radial velocity from position and velocity arrays in m and m/s."""
+
+    rvec = r - loc
+    rng = np.sqrt(np.einsum('...i,...i', rvec, rvec))
+    rr = np.einsum('...i,...i', v - vel, rvec) / rng
+    return rng, rr, np.einsum('...i,...i', vel, rvec) / rng
+
+
+def _first_if_scalar(epoch, values):
+    if getattr(epoch, 'isscalar', False):
+        return [x[0] for x in values]
+    return values
+
+
 class Station:
     """Tracking station model, to compute range and range rate."""
 
@@ -30,6 +56,8 @@ class Station:
         self._loc = EarthLocation.from_geodetic(lon, lat, height)
         self._name = name
         self._site_code = site_code
+        self._geometry = OrderedDict()
+        self._geometry_bytes = 0
 
     @property
     def name(self):
@@ -55,15 +83,54 @@ class Station:
         """Get GCRS position and velocity vectors of this station at given epoch."""
         return self._loc.get_gcrs_posvel(obstime=epoch)
 
+    def _posvel(self, epoch):
+        """GCRS position and velocity as m and m/s arrays, memoized for recent timelines within GEOMETRY_BYTES."""
+
+        if not isinstance(epoch, Timeline):
+            loc, vel = self._loc.get_gcrs_posvel(obstime=epoch)
+            return loc.get_xyz(xyz_axis=-1).to_value(u.m), vel.get_xyz(xyz_axis=-1).to_value(u.m/u.s)
+
+        posvel = self._geometry.get(epoch.key)
+        if posvel is None:
+            posvel = self._posvel(epoch.to_time())
+            self._memoize(epoch.key, posvel)
+        else:
+            self._geometry.move_to_end(epoch.key)
+        return posvel
+
+    def _memoize(self, key, posvel):
+        """Memoize positions and velocities, evicting the least recently used beyond the limits."""
+
+        size = sum(a.nbytes for a in posvel)
+        if size > GEOMETRY_BYTES:
+            return
+        self._geometry[key] = posvel
+        self._geometry_bytes += size
+        while len(self._geometry) > GEOMETRY_SIZE or self._geometry_bytes > GEOMETRY_BYTES:
+            _, evicted = self._geometry.popitem(last=False)
+            self._geometry_bytes -= sum(a.nbytes for a in evicted)
+
+    def clear_cache(self):
+        """Drop the memoized station positions and velocities."""
+        self._geometry.clear()
+        self._geometry_bytes = 0
+
+    def observe(self, ephem, epochs):
+        """Range, range rate and station radial velocity as m and m/s arrays over a Timeline."""
+
+        rv = ephem.rv(epochs.to_time())
+        loc, vel = self._posvel(epochs)
+        return _topocentric(rv[0].to_value(u.m), rv[1].to_value(u.m/u.s), loc, vel)
+
     def range_and_rates(self, rv, epoch):
-        """Convert position, velocity state rv to station-relative range, range rate and station component."""
+        """
+        Convert position, velocity state rv to station-relative range, range rate and station component.
+        The epoch may also be an array of epochs or a Timeline, with rv the corresponding arrays of states.
+        """
 
-        loc, vel = self._loc.get_gcrs_posvel(obstime=epoch)
-        rvec = rv[0] - loc.xyz
-        r = norm(rvec)
-        vvec = rv[1] - vel.xyz
-        rr = vvec.dot(rvec)/r
-        return r, rr, vel.xyz.dot(rvec)/r
+        loc, vel = self._posvel(epoch)
+        r, rr, rs = _topocentric(rv[0].to_value(u.m), rv[1].to_value(u.m/u.s), loc, vel)
+        return r*u.m, rr*(u.m/u.s), rs*(u.m/u.s)
 
     def range_and_rate(self, rv, epoch):
         """Convert position, velocity state rv to station-relative range and range rate."""
@@ -71,17 +138,20 @@ class Station:
         return r, rr
 
     def range_rate_accel(self, ephem, epoch):
-        """Convert state rv to station-relative range, range rate and radial accelerations."""
-
-        r, rr, v_station = self.range_and_rates(ephem.rv(epoch), epoch)
+        """
+        Convert state rv to station-relative range, range rate and radial accelerations.
+        The epoch may also be an array of epochs or a Timeline, giving arrays.
+        """
 
-        e1s = epoch + 1*u.s
-        _, n_rr, nv_station = self.range_and_rates(ephem.rv(e1s), e1s)
+        timeline = as_timeline(epoch)
+        n = len(timeline)
+        both = Timeline(timeline.reference, np.concatenate((timeline.seconds, timeline.seconds + 1.0)))
+        r, rr, v_station = self.observe(ephem, both)
 
-        net_accel = (n_rr - rr)/(1*u.s)
-        station_accel = (nv_station - v_station)/(1*u.s)
+        net_accel = (rr[n:] - rr[:n])/(1*u.s)
+        station_accel = (v_station[n:] - v_station[:n])/(1*u.s)
 
-        return r, rr, net_accel, station_accel
+        return _first_if_scalar(epoch, (r[:n]*u.m, rr[:n]*(u.m/u.s), net_accel*(u.m/u.s), station_accel*(u.m/u.s)))
 
     def range_rate_elevation(self, rv, epoch):
         """Convert position, velocity state rv to station-relative range, range rate and elevation."""
@@ -110,13 +180,8 @@ class Station:
     def range_rate_accel_elev(self, ephem, epoch):
         """Convert state rv to station-relative range, range rate, radial accelerations and elevation."""
 
-        r, rr, v_station, elev = self.range_rate_elevation(ephem.rv(epoch), epoch)
-
-        e1s = epoch + 1*u.s
-        _, n_rr, nv_station = self.range_and_rates(ephem.rv(e1s), e1s)
-
-        net_accel = (n_rr - rr)/(1*u.s)
-        station_accel = (nv_station - v_station)/(1*u.s)
+        r, rr, net_accel, station_accel = self.range_rate_accel(ephem, epoch)
+        _, _, _, elev = self.range_rate_elevation(ephem.rv(epoch), epoch)
 
         return r, rr, net_accel, station_accel, elev
 
@@ -129,28 +194,25 @@ class Station:
     def rv_with_rangelag(self, rv, epoch):
         """Add station-relative range lag to position, velocity vectors."""
 
-        loc, vel = self._loc.get_gcrs_posvel(obstime=epoch)
-        rvec = rv[0] - loc.xyz
-        r = norm(rvec)
-
-        vvec = rv[1] - vel.xyz
-        rr = vvec.dot(rvec)/r
+        loc, vel = self._posvel(epoch)
+        pos = rv[0].to_value(u.m)
+        r, rr, _ = _topocentric(pos, rv[1].to_value(u.m/u.s), loc, vel)
 
-        dt = r/const.c
+        dt = r/const.c.to_value(u.m/u.s)
         dr = rr*dt
-        return rv[0] + dr*rvec/r, rv[1]
+        return (pos + (dr/r)[..., np.newaxis]*(pos - loc))*u.m, rv[1]
 
     def rv_with_ratelag(self, rv, epoch):
         """Add station-relative range rate lag to position, velocity vectors."""
 
-        loc, _ = self._loc.get_gcrs_posvel(obstime=epoch)
-        rvec = rv[0] - loc.xyz
-        r = norm(rvec)
+        loc, _ = self._posvel(epoch)
+        rvec = rv[0].to_value(u.m) - loc
+        r = np.sqrt(np.einsum('...i,...i', rvec, rvec))
 
-        dt = r/const.c
-        ra = -Earth.k/(r*r)
+        dt = r/const.c.to_value(u.m/u.s)
+        ra = -Earth.k.to_value(u.m**3/u.s**2)/(r*r)
         drr = ra*dt
-        return rv[0], rv[1] + drr*rvec/r
+        return rv[0], rv[1] + (drr/r)[..., np.newaxis]*rvec*(u.m/u.s)
 
     def add_to_czml(self, czml, color):
         """Add station to CZML."""
@@ -175,6 +237,9 @@ Stations = {
     "m": ssrMillstone,
     "millstone": ssrMillstone,
     "Millstone": ssrMillstone,
+    "dss24": dss24,
+    "goldstone24": dss24,
+    "Goldstone24": dss24,
     "g": dss25,
     "dss25": dss25,
     "goldstone": dss25,
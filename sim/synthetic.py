@@ -0,0 +1,23 @@
+"""Synthetic flyby orbits, for simulations, tests and benchmarks without Horizons access"""
+
+from astropy import units as u
+
+from poliastro.bodies import Earth
+from poliastro.frames import Planes
+from poliastro.twobody.orbit import Orbit
+
+from .tracking import Tracking
+
+
+def near_orbit():
+    """NEAR-like hyperbolic Earth flyby, at perigee."""
+
+    return Orbit.from_classical(attractor=Earth,
+                                a=-8493*u.km,
+                                ecc=1.8135*u.one,
+                                inc=108*u.deg,
+                                raan=88.4*u.deg,
+                                argp=145.3*u.deg,
+                                nu=0*u.deg,
+                                epoch=Tracking.NEAR_PERIGEE.value.tdb,
+                                plane=Planes.EARTH_EQUATOR)
@@ -0,0 +1,112 @@
+"""Float seconds timeline for the simulation hot paths
+
+Epochs are held as float64 TDB seconds from a single reference epoch,
+so that the station, fitter and analysis loops work on plain arrays.
+Conversion to and from astropy Time is meant only at API boundaries,
+and is checked to round trip within PRECISION.
+"""
+
+import hashlib
+
+from astropy.time import Time
+
+import numpy as np
+
+
+PRECISION = 1e-6    # seconds, guaranteed round trip error of epochs converted from Time
+
+DAY = 86400.0
+
+
+class Timeline:
+    """Epochs as float64 TDB seconds from a single reference epoch."""
+
+    def __init__(self, reference, seconds):
+        """Reference epoch, and seconds of TDB elapsed since it for each epoch."""
+
+        self._reference = reference
+        self._tdb = reference.tdb
+        self._seconds = np.atleast_1d(np.asarray(seconds, dtype=float))
+        self._times = None
+        self._key = None
+
+    @classmethod
+    def from_time(cls, times, reference=None, precision=PRECISION):
+        """Timeline of epochs in times, from reference or else the first epoch, checked to precision seconds."""
+
+        times = times.reshape((1,)) if times.isscalar else times
+        tdb = times.tdb
+        reference = times[0] if reference is None else reference
+        ref = reference.tdb
+
+        timeline = cls(reference, ((tdb.jd1 - ref.jd1) + (tdb.jd2 - ref.jd2)) * DAY)
+
+        back = timeline._tdb_times()
+        error = np.max(np.abs((back.jd1 - tdb.jd1) + (back.jd2 - tdb.jd2))) * DAY
+        if error > precision:
+            raise ValueError(f"Timeline exceeds precision {precision} s by round trip error {error} s")
+
+        timeline._times = times
+        return timeline
+
+    @property
+    def reference(self):
+        """Reference epoch"""
+        return self._reference
+
+    @property
+    def seconds(self):
+        """TDB seconds of each epoch from the reference"""
+        return self._seconds
+
+    def seconds_from(self, reference):
+        """TDB seconds of each epoch from another reference epoch"""
+        ref = reference.tdb
+        return self._seconds + ((self._tdb.jd1 - ref.jd1) + (self._tdb.jd2 - ref.jd2)) * DAY
+
+    @property
+    def key(self):
+        """
+        Hash of the reference, epochs and their time scale, for keying cached computations.
+        The scale is included as ephemerides interpolate on raw Julian dates in the scale they were built in.
+        """
+        if self._key is None:
+            scale = self._reference.scale if self._times is None else self._times.scale
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(scale.encode())
+            digest.update(np.array([self._tdb.jd1, self._tdb.jd2]).tobytes())
+            digest.update(np.ascontiguousarray(self._seconds).tobytes())
+            self._key = digest.hexdigest()
+        return self._key
+
+    def to_time(self):
+        """Epochs as astropy Time, the original if converted from Time, else in the scale of the reference."""
+        if self._times is None:
+            self._times = getattr(self._tdb_times(), self._reference.scale)
+        return self._times
+
+    def _tdb_times(self):
+        ref = self._tdb
+        return Time(ref.jd1, ref.jd2 + self._seconds/DAY, format='jd', scale='tdb')
+
+    def shifted(self, seconds):
+        """Timeline of the same epochs offset by seconds."""
+        return Timeline(self._reference, self._seconds + seconds)
+
+    def __len__(self):
+        return len(self._seconds)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            item = slice(item, item+1 or None)
+        sub = Timeline(self._reference, self._seconds[item])
+        if self._times is not None:
+            sub._times = self._times[item]
+        return sub
+
+
+def as_timeline(epochs):
+    """Timeline for epochs given as Time, a sequence of Time, or already as a Timeline."""
+    if isinstance(epochs, Timeline):
+        return epochs
+    return Timeline.from_time(epochs if isinstance(epochs, Time) else Time(epochs))
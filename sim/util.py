@@ -1,11 +1,9 @@
 #!/usr/bin/env python
 """Utility functions used in the notebooks"""
 
-from itertools import pairwise
-
 from astropy import visualization
 from astropy import units as u
-from astropy.time import Time
+from astropy.time import Time, TimeDelta
 
 from poliastro.util import norm
 from poliastro.frames import Planes
@@ -21,6 +19,9 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
+from .observations import Observations
+from .timeline import Timeline, as_timeline
+
 
 def orbit_from_horizons(spacecraft, epoch):
     """Compute orbital elements for flyby with initial coordinates from JPL Horizons."""
@@ -33,8 +34,15 @@ def orbit_from_horizons(spacecraft, epoch):
 def make_epochs(start, end, interval):
     """Compile epochs array for simulation."""
 
-    offsets = np.arange(0, (end-start)/(1*u.s), interval.to_value(u.s))
-    return start + (offsets << u.s)
+    offsets = np.arange(0, (end-start).to_value(u.s), interval.to_value(u.s))
+    return start + TimeDelta(offsets, format='sec')
+
+
+def make_timeline(start, end, interval):
+    """Compile epochs for simulation as a Timeline of TDB seconds from start."""
+
+    span = Timeline.from_time(end, reference=start).seconds[0]
+    return Timeline(start, np.arange(0, span, interval.to_value(u.s)))
 
 
 def horizons_range_rate_accel(spacecraft, station, epoch):
@@ -94,24 +102,21 @@ def describe_trajectory(ephem, station):
     print()
     print("::TRAJECTORY::")
 
-    rv = [station.coord_range_and_rate(ephem.sample(e), e) for e in ephem.epochs]
-
-    ranges = [x[0] for x in rv]
-    speeds = [x[1] for x in rv]
+    timeline = as_timeline(ephem.epochs)
+    r, v = ephem.rv()
+    ranges, speeds = station.range_and_rate((r, v), timeline)
 
     print("Start and end ranges:", ranges[1] << u.km, ranges[-1] << u.km)
     print("Start and end radial speeds:", speeds[0] << (u.km/u.s), speeds[-1] << (u.km/u.s))
 
-    min_range = min(ranges)
-
-    periapse_indices = [i for i, v in enumerate(ranges) if v == min_range]
-    periapse_epoch = ephem.epochs[periapse_indices[0]]
-    periapse_speed = norm(ephem.rv(periapse_epoch)[1]) << (u.km/u.s)
+    closest = np.argmin(ranges)
+    periapse_epoch = ephem.epochs[closest]
+    periapse_speed = norm(v[closest]) << (u.km/u.s)
 
-    print("Closest:", min_range, "speed", periapse_speed, " at ", periapse_epoch)
+    print("Closest:", ranges[closest] << u.km, "speed", periapse_speed, " at ", periapse_epoch)
 
-    initial_velocity = ephem.rv(ephem.epochs[0])[1]
-    final_velocity = ephem.rv(ephem.epochs[-1])[1]
+    initial_velocity = v[0]
+    final_velocity = v[-1]
     inner = np.inner(initial_velocity, final_velocity)
     norms = norm(initial_velocity)*norm(final_velocity)
     cos = inner/norms
@@ -119,40 +124,85 @@ def describe_trajectory(ephem, station):
 
 
 def find_swings(epochs, values):
-    """Find swings in an oscillating time sequency."""
+    """Find swings in an oscillating time sequency, with epochs as Time or a sequence of Time."""
+
+    epochs = epochs if isinstance(epochs, Time) else Time(epochs)
+    values = np.asarray(values)
+    peaks, _ = signal.find_peaks(values)
+    troughs, _ = signal.find_peaks(-values)
+
+    turns = np.sort(np.concatenate((peaks, troughs)))
+    if len(turns) < 2:
+        raise ValueError("no swings found")
+    swing_heights = np.abs(np.diff(values[turns]))
 
-    peaks = signal.find_peaks(values)
-    troughs = signal.find_peaks(np.multiply(-1, values))
+    return Time(epochs[turns[1:]]), swing_heights
 
-    swing = {}
-    for i, v in enumerate(peaks[0]):
-        swing[v] = values[v]
-    for i, v in enumerate(troughs[0]):
-        swing[v] = values[v]
 
-    swing_epochs = []
-    swing_heights = []
-    for i, j in pairwise(sorted(swing)):
-        swing_epochs.append(epochs[j])
-        swing_heights.append(abs(swing[j]-swing[i]))
+def downsample(values, buckets, x=None):
+    """
+    Indices of a shape preserving subset of values, keeping the first, last, minimum and maximum
+    within each of the given number of equal spans of x, e.g. one per pixel column of a plot.
+    x defaults to the sample positions, and must be sorted.
+    """
 
-    return Time(swing_epochs), swing_heights
+    values = np.asarray(values)
+    size = len(values)
+    if buckets < 1 or size <= 2*buckets:
+        return np.arange(size)
+
+    x = np.arange(size, dtype=float) if x is None else np.asarray(x, dtype=float)
+    edges = np.linspace(x[0], x[-1], buckets+1)
+    bucket = np.clip(np.searchsorted(edges, x, side='right') - 1, 0, buckets-1)
+
+    # sorted by bucket then value, the first and last of each bucket are its minimum and maximum
+    order = np.lexsort((values, bucket))
+    sizes = np.bincount(bucket, minlength=buckets)
+    ends = np.cumsum(sizes)[sizes > 0]
+    starts = ends - sizes[sizes > 0]
+    keep = np.concatenate(([0, size-1], order[starts], order[ends-1]))
+    return np.unique(keep)
+
+
+def plot_buckets(ax):
+    """Number of pixel columns spanned by the axes, for downsampling."""
+
+    fig = ax.get_figure()
+    return int(fig.get_figwidth() * fig.dpi * ax.get_position().width)
 
 
 def find_rates(times, residual):
     """Compute rates in residual."""
 
-    rate = []
-    for i, e in enumerate(times[1:]):
-        dr = residual[i] - residual[i-1]
-        dt = (e - times[i-1]).to_value(u.s)
-        rate.append(dr/dt)
+    secs = as_timeline(times).seconds
+    residual = np.asarray(residual)
 
-    return rate
+    i = np.arange(len(secs) - 1)
+    rate = (residual[i] - residual[i-1]) / (secs[i+1] - secs[i-1])
+    return list(rate)
 
 
-def plot_residual(times, residual, title, ylab, ylim=None, ax=None):
-    """Plot trajectory residual from a least square fit."""
+def _thinned(times, values, buckets):
+    if buckets < 1 or len(values) <= 2*buckets:
+        return times, values
+    idx = downsample(values, buckets, as_timeline(times).seconds)
+    if len(idx) == len(values):
+        return times, values
+    return times[idx], values[idx]
+
+
+def plot_residual(times, residual, title, ylab, ylim=None, ax=None, thin=True):
+    """
+    Plot trajectory residual from a least square fit.
+    Times may be Time or a sequence of Time, and residuals sequences or NumPy arrays, or Observations plotted
+    per station at their own epochs with times None, and are downsampled to the plot width unless thin is False.
+    """
+
+    if isinstance(residual, Observations):
+        times = residual.times
+        residual = {name: (obs.times, obs.values) for name, obs in residual.by_station()}
+    elif not isinstance(times, Time):
+        times = Time(times)
 
     visualization.time_support()
     newplot = ax is None
@@ -185,19 +235,26 @@ def plot_residual(times, residual, title, ylab, ylim=None, ax=None):
         else:
             ax.xaxis.set_major_locator(mdates.MinuteLocator(interval=1))
 
+    buckets = plot_buckets(ax) if thin else 0
+
     if isinstance(residual, dict):
-        for v in residual:
-            ax.plot(times, [v * 1e3 for v in residual[v]], label = f'{v.name}')
+        for k, v in residual.items():
+            t, v = v if isinstance(v, tuple) else (times, v)
+            v = np.asarray(v) * 1e3
+            ax.plot(*_thinned(t, v, buckets), label = f'{getattr(k, "name", k)}')
         plt.legend(loc="best")
     else:
-        ax.plot(times, [v * 1e3 for v in residual])
+        v = np.asarray(residual) * 1e3
+        ax.plot(*_thinned(times, v, buckets))
 
     return plt
 
-def plot_swings(times, residual, title, ylab, minmax=False):
-    """Plot the swings in an oscillating residual."""
+def plot_swings(times, residual, title, ylab, minmax=False, swings=None):
+    """Plot the swings in an oscillating residual, or the precomputed (epochs, heights) swings."""
 
-    peak_epochs, peak_swings = find_swings(times, residual)
+    if swings is None:
+        swings = find_swings(times, residual)
+    peak_epochs, peak_swings = swings
     visualization.time_support()
     _, ax = plt.subplots()
     plt.xlabel(None)
@@ -0,0 +1,14 @@
+"""Unit test setup, with the IERS tables as installed."""
+
+import pytest
+
+from astropy.utils import iers
+
+from sim import synthetic
+
+iers.conf.auto_download = False
+
+
+@pytest.fixture(scope='session')
+def near_orbit():
+    return synthetic.near_orbit()
@@ -0,0 +1,113 @@
+"""Tests of the batch driver's reference orbit resolution, without Horizons access"""
+
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+import json
+from pathlib import Path
+
+from astropy import units as u
+
+import numpy as np
+import pytest
+
+from sim import batch
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_resolve_queries_each_flyby_once(monkeypatch, near_orbit):
+    queries = []
+
+    def reference_orbit(spacecraft, epoch):
+        queries.append((spacecraft, epoch))
+        return near_orbit
+
+    monkeypatch.setattr(batch, 'reference_orbit', reference_orbit)
+    spec = {"name": "NEAR", "spacecraft": "NEAR", "epoch": "NEAR_PERIGEE", "stations": ["dss34", "dss25"],
+            "windows": [["NEAR_CANBERRA_START", "1 h"]], "lags": batch.LAGS}
+    runs = batch.resolve(batch.expand(spec))
+
+    assert len(runs) == 8 and queries == [("NEAR", "NEAR_PERIGEE")]
+    assert all(r["elements"] == runs[0]["elements"] for r in runs)
+
+    orbit = batch._orbit(runs[0])
+    assert np.allclose(orbit.r.to_value(u.m), near_orbit.r.to_value(u.m), rtol=0, atol=1e-3)
+    assert np.allclose(orbit.v.to_value(u.m/u.s), near_orbit.v.to_value(u.m/u.s), rtol=0, atol=1e-6)
+
+
+def test_resolve_failure(monkeypatch):
+
+    def reference_orbit(spacecraft, epoch):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(batch, 'reference_orbit', reference_orbit)
+    runs = batch.resolve(batch.expand(batch.CATALOGUE[:1]))
+    assert runs and all(r["error"] == "ConnectionError: no network" and "elements" not in r for r in runs)
+
+
+ELEMENTS = {"a": "-8493 km", "ecc": "1.8135", "inc": "108 deg", "raan": "88.4 deg", "argp": "145.3 deg", "nu": "0 deg"}
+
+SPEC = {"name": "synthetic", "spacecraft": "NEAR", "epoch": "NEAR_PERIGEE", "elements": ELEMENTS,
+        "stations": ["dss34"], "windows": [["NEAR_CANBERRA_START", "1 h"]], "sampling": "5 min"}
+
+
+@pytest.mark.parametrize('lag', ["bogus", "scaled:", "scaled:x", "Full"])
+def test_expand_rejects_unknown_lags(lag):
+    with pytest.raises(ValueError, match="Unknown lag variant"):
+        batch.expand(dict(SPEC, lags=["none", lag]))
+
+
+@pytest.mark.parametrize('lag', batch.LAGS + ["scaled:0.1"])
+def test_run(lag):
+    config, = batch.expand(dict(SPEC, lags=[lag]))
+    record = batch.run(config)
+
+    assert "error" not in record
+    assert record["lag"] == lag and record["epochs"] == 11 and record["success"]
+    assert set(record["fitted"]) == set(ELEMENTS)
+    assert np.isfinite(record["chisqr"]) and record["runtime"] > 0
+    summary = record["residual"]["Canberra-34"]
+    assert summary["rms"] <= summary["max"]
+    if lag == "none":
+        assert summary["max"] < 1e-6
+
+
+def test_run_error():
+    config, = batch.expand(dict(SPEC, stations=["nowhere"], lags=["none"]))
+    record = batch.run(config)
+    assert record["error"].startswith("KeyError") and "chisqr" not in record and "runtime" in record
+
+
+def test_survey(tmp_path, monkeypatch):
+
+    def reference_orbit(spacecraft, epoch):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(batch, 'reference_orbit', reference_orbit)
+    horizons = {k: v for k, v in SPEC.items() if k != "elements"}
+    runs = batch.expand([dict(SPEC, lags=["lighttime"]), dict(horizons, name="horizons", lags=["none"])])
+    store = tmp_path / "survey.jsonl"
+
+    records = list(batch.survey(runs, store, jobs=1))
+    stored = [json.loads(line) for line in store.read_text(encoding="utf-8").splitlines()]
+
+    assert sorted(r["name"] for r in records) == sorted(r["name"] for r in stored) == ["horizons", "synthetic"]
+    failed, = [r for r in stored if r["name"] == "horizons"]
+    fitted, = [r for r in stored if r["name"] == "synthetic"]
+    assert failed["error"] == "ConnectionError: no network" and failed["runtime"] == 0.0
+    assert "error" not in fitted and fitted["elements"] == ELEMENTS and fitted["success"]
+
+
+def test_flybys_dry_run(tmp_path, capsys):
+    loader = SourceFileLoader('flybys', str(ROOT / 'flybys'))
+    flybys = module_from_spec(spec_from_loader('flybys', loader))
+    loader.exec_module(flybys)
+    spec = tmp_path / "spec.json"
+    spec.write_text(json.dumps(dict(SPEC, lags=batch.LAGS)), encoding="utf-8")
+
+    flybys.main(["-n", str(spec)])
+    assert [json.loads(line)["lag"] for line in capsys.readouterr().out.splitlines()] == batch.LAGS
+
+    spec.write_text(json.dumps(dict(SPEC, lags=["bogus"])), encoding="utf-8")
+    with pytest.raises(ValueError):
+        flybys.main(["-n", str(spec)])
@@ -0,0 +1,178 @@
+"""Tests of the trajectory cache"""
+
+from astropy import units as u
+from astropy import constants as const
+from astropy.time import Time
+
+from poliastro.twobody.sampling import EpochsArray
+
+import matplotlib
+import numpy as np
+
+from sim.fitorbit import OrbitFitter, TrajectoryCache
+from sim.observations import Observations
+from sim.stations import dss25, dss34
+from sim.tracking import Tracking
+from sim.util import make_epochs, plot_residual
+
+matplotlib.use('Agg')
+
+EPOCH = Time('1998-01-23 07:23:00', scale='tdb')
+
+
+class Sized:
+    """Stand-in trajectory of a given size."""
+
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def _key(cache, a):
+    return cache.key([a, 1.8, 1.9], EPOCH, 'grid')
+
+
+def test_key_quantizes_elements():
+    cache = TrajectoryCache(digits=6)
+    assert cache.key([1.0000001], EPOCH, 'grid') == cache.key([1.0], EPOCH, 'grid')
+    assert cache.key([1.0], EPOCH, 'grid') != cache.key([1.0], EPOCH, 'other')
+
+
+def test_hits_and_misses():
+    cache = TrajectoryCache()
+    k = _key(cache, 1.0)
+    assert cache.get(k) is None
+    t = Sized(10)
+    cache.put(k, t)
+    assert cache.get(k) is t
+    assert cache.get(_key(cache, 2.0)) is None
+
+    info = cache.info()
+    assert (info.hits, info.misses, info.currsize, info.nbytes) == (1, 2, 1, 10)
+
+    cache.clear()
+    assert cache.info() == (0, 0, 256, 0, 0)
+
+
+def test_evicts_least_recently_used_by_count():
+    cache = TrajectoryCache(maxsize=2)
+    k1, k2, k3 = (_key(cache, a) for a in (1.0, 2.0, 3.0))
+    cache.put(k1, Sized(1))
+    cache.put(k2, Sized(1))
+    cache.get(k1)               # k2 is now least recently used
+    cache.put(k3, Sized(1))
+
+    assert cache.get(k2) is None
+    assert cache.get(k1) is not None and cache.get(k3) is not None
+    assert cache.info().currsize == 2
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = TrajectoryCache(max_bytes=100)
+    k1, k2, k3 = (_key(cache, a) for a in (1.0, 2.0, 3.0))
+    cache.put(k1, Sized(40))
+    cache.put(k2, Sized(40))
+    cache.put(k3, Sized(40))
+
+    assert cache.get(k1) is None
+    assert cache.nbytes == 80
+
+
+def test_update_accounts_for_growth():
+    cache = TrajectoryCache(max_bytes=100)
+    k1, k2 = _key(cache, 1.0), _key(cache, 2.0)
+    t1, t2 = Sized(40), Sized(40)
+    cache.put(k1, t1)
+    cache.put(k2, t2)
+
+    t2.nbytes = 50
+    cache.update(k2)
+    assert cache.nbytes == 90
+
+    t2.nbytes = 70
+    cache.update(k2)
+    assert cache.get(k1) is None
+    assert cache.nbytes == 70
+
+
+def test_disabled():
+    cache = TrajectoryCache(maxsize=0)
+    k = _key(cache, 1.0)
+    cache.put(k, Sized(1))
+    cache.update(k)
+    assert cache.get(k) is None
+    assert cache.nbytes == 0
+
+
+def test_scales_not_shared(near_orbit):
+    """Fits over the same instants in UTC and TDB must not share ephemerides interpolated on raw Julian dates."""
+
+    start = Tracking.NEAR_CANBERRA_START.value
+    epochs = make_epochs(start, start + 1*u.hour, 60*u.s).utc
+    data = np.zeros((len(epochs), 1))
+    cache = TrajectoryCache()
+
+    fitter = OrbitFitter(near_orbit, [dss34], max_iter=3, cache=cache)
+    fitter.fit_doppler_data(epochs, data)
+    params = fitter.result.params
+
+    shared = OrbitFitter(near_orbit, [dss25], max_iter=3, cache=cache)
+    shared.fit_doppler_data(epochs.tdb, data, params=params)
+    fresh = OrbitFitter(near_orbit, [dss25], max_iter=3, cache=TrajectoryCache(maxsize=0))
+    fresh.fit_doppler_data(epochs.tdb, data, params=params)
+
+    assert np.allclose(shared.result.residual, fresh.result.residual)
+
+
+def test_search_doppler_data(near_orbit):
+    start = Tracking.NEAR_CANBERRA_START.value
+    epochs = make_epochs(start, start + 1*u.hour, 5*u.min)
+    ephem = near_orbit.to_ephem(EpochsArray(epochs))
+    r, rr, net_accel, station_accel = dss34.range_rate_accel(ephem, epochs[:-1])
+    data = (rr - (net_accel + station_accel)*r/const.c)[:, np.newaxis]
+
+    local = OrbitFitter(near_orbit, [dss34])
+    local.fit_doppler_data(epochs[:-1], data)
+
+    fitter = OrbitFitter(near_orbit, [dss34])
+    fitter.search_doppler_data(epochs[:-1], data, workers=2, popsize=3, maxiter=2, seed=0)
+
+    assert fitter.orbit is not None
+    reference = [fitter.param(k).value for k in fitter.result.params]
+    assert len(fitter.search.candidates) >= 1 and np.allclose(fitter.search.candidates[0], reference)
+    assert np.isfinite(fitter.result.chisqr)
+    assert fitter.result.chisqr <= local.result.chisqr * (1 + 1e-9)
+
+
+def test_fit_observations(near_orbit):
+    """Two stations sharing some epochs and not others, fitted and differenced without filling the gaps."""
+
+    start = Tracking.NEAR_CANBERRA_START.value
+    hourly = make_epochs(start, start + 1*u.hour, 5*u.min)
+    unshared = make_epochs(start, start + 30*u.min, 10*u.min) + 150*u.s
+    epochs = {dss34: hourly, dss25: Time([*hourly[:3], *unshared])}
+    ephem = near_orbit.to_ephem(EpochsArray(make_epochs(start, start + 70*u.min, 150*u.s)))
+
+    times, stations, values = [], [], []
+    for station, t in epochs.items():
+        r, rr, net_accel, station_accel = station.range_rate_accel(ephem, t)
+        times += list(t)
+        stations += [station] * len(t)
+        values.append(rr - (net_accel + station_accel)*r/const.c)
+    obs = Observations(Time(times), stations, np.concatenate(values))
+
+    fitter = OrbitFitter(near_orbit, [dss34, dss25], max_iter=3)
+    fitter.fit_observations(obs)
+    residual = fitter.observations_residual(obs)
+
+    assert residual.kind == 'doppler_residual'
+    assert residual.station_names == obs.station_names == [dss34.name, dss25.name]
+    assert len(residual) == len(obs)
+
+    _, data, _ = obs.grid()
+    _, resid, _ = residual.grid()
+    assert np.isnan(data).any() and not np.isnan(data).all(axis=1).any()
+    assert np.array_equal(np.isnan(resid), np.isnan(data))
+    assert np.all(np.isfinite(resid[~np.isnan(data)]))
+
+    ax = plot_residual(None, residual, 'fit', 'doppler (mm/s)').gca()
+    assert [line.get_label() for line in ax.get_lines()] == residual.station_names
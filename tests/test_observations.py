@@ -0,0 +1,146 @@
+"""Tests of the array-backed observation dataset"""
+
+from astropy import units as u
+from astropy.time import Time
+
+import numpy as np
+import pytest
+
+from sim.observations import Observations
+from sim.stations import dss34
+
+START = Time('1998-01-24 00:00:00', scale='utc')
+
+
+def _observations(kind='doppler'):
+    # two stations at 10 minute intervals, sharing the epochs 0 and 30 minutes
+    epochs = START + [0, 10, 20, 30, 0, 30, 40] * u.min
+    stations = ['Canberra-34'] * 4 + ['Goldstone-24'] * 3
+    return Observations(epochs, stations, [1.0, 2.0, 3.0, 4.0, -1.0, -4.0, -5.0], [1, 1, 1, 1, 2, 2, 2], kind)
+
+
+def test_sorted_by_epoch():
+    obs = _observations()
+    assert np.all(np.diff(obs.epochs.seconds) >= 0)
+    assert list(obs.stations[:2]) == ['Canberra-34', 'Goldstone-24']
+    assert obs.station_names == ['Canberra-34', 'Goldstone-24']
+    assert obs.times.scale == 'utc'
+
+
+def test_single_station():
+    obs = Observations(START + [0, 1] * u.min, dss34, [1, 2] * u.mm/u.s)
+    assert list(obs.stations) == ['Canberra-34', 'Canberra-34']
+    assert np.allclose(obs.values, [1e-3, 2e-3])
+
+
+def test_between():
+    obs = _observations()
+    sub = obs.between(START + 10*u.min, START + 30*u.min)
+    assert list(sub.values) == [2.0, 3.0]
+    assert len(obs.between(START + 30*u.min, START + 10*u.min)) == 0
+    assert len(obs.between(START + 1*u.day, START + 2*u.day)) == 0
+
+
+@pytest.mark.parametrize('selection', [
+    lambda obs: obs.select(['Altair']),
+    lambda obs: obs.between(START - 1*u.day, START - 1*u.hour),
+])
+def test_empty_selection(selection):
+    empty = selection(_observations())
+    assert len(empty) == 0 and empty.station_names == [] and len(empty.times) == 0
+
+    epochs, values, weights = empty.grid(['Canberra-34'])
+    assert len(epochs) == 0 and values.shape == weights.shape == (0, 1)
+    assert np.all(np.isnan(empty.align(START + [0, 10] * u.min, ['Canberra-34'])))
+
+
+def test_align_interpolate_edges():
+    obs = _observations()
+    epochs = START + [-1, 0, 5, 30, 31] * u.min
+    aligned = obs.align(epochs, [dss34, 'Goldstone-24', 'Altair'])
+
+    assert aligned.shape == (5, 3)
+    assert np.allclose(aligned[1:4, 0], [1.0, 1.5, 4.0])
+    assert np.isnan(aligned[0, 0]) and np.isnan(aligned[4, 0])
+    assert np.allclose(aligned[1:, 1], [-1.0, -1.5, -4.0, -4.1])
+    assert np.all(np.isnan(aligned[:, 2]))
+
+
+def test_align_nearest_tolerance():
+    obs = _observations()
+    epochs = START + [-1, 4, 6, 45] * u.min
+    nearest = obs.align(epochs, ['Canberra-34'], how='nearest')
+    assert list(nearest[:, 0]) == [1.0, 1.0, 2.0, 4.0]
+
+    within = obs.align(epochs, ['Canberra-34'], how='nearest', tolerance=5*u.min)
+    assert np.allclose(within[:, 0], [1.0, 1.0, 2.0, np.nan], equal_nan=True)
+
+    with pytest.raises(ValueError):
+        obs.align(epochs, how='cubic')
+
+
+def test_align_one_measurement():
+    obs = Observations(START + [10] * u.min, 'Altair', [7.0], kind='range_residual')
+    epochs = START + [0, 10, 20] * u.min
+
+    assert np.allclose(obs.align(epochs)[:, 0], [np.nan, 7.0, np.nan], equal_nan=True)
+    assert list(obs.align(epochs, how='nearest')[:, 0]) == [7.0, 7.0, 7.0]
+    assert np.allclose(obs.align(epochs, how='nearest', tolerance=1*u.min)[:, 0], [np.nan, 7.0, np.nan],
+                       equal_nan=True)
+
+
+def test_grid_shared_epochs():
+    obs = _observations()
+    epochs, values, weights = obs.grid(['Canberra-34', 'Goldstone-24'])
+
+    assert np.allclose(epochs.seconds, [0, 600, 1200, 1800, 2400])
+    assert np.allclose(values, [[1, -1], [2, np.nan], [3, np.nan], [4, -4], [np.nan, -5]], equal_nan=True)
+    assert np.allclose(weights, [[1, 2], [1, 0], [1, 0], [1, 2], [0, 2]])
+
+
+def test_grid_repeated_measurement():
+    obs = Observations(START + [0, 0] * u.min, 'Altair', [1.0, 2.0])
+    with pytest.raises(ValueError):
+        obs.grid()
+
+
+def test_from_grid_round_trip():
+    obs = _observations()
+    epochs, values, weights = obs.grid()
+    back = Observations.from_grid(epochs, obs.station_names, values, weights, obs.kind)
+
+    assert len(back) == len(obs)
+    assert list(back.stations) == list(obs.stations)
+    assert np.array_equal(back.values, obs.values) and np.array_equal(back.weights, obs.weights)
+
+
+def test_from_dicts():
+    data = {'Millstone': {START + 2*u.min: -730, START + 4*u.min: -605},
+            'Altair': {START: -929, START + 3*u.min: -700}}
+    obs = Observations.from_dicts(data, 'range_residual')
+
+    assert list(obs.values) == [-929, -730, -700, -605]
+    assert list(obs.stations) == ['Altair', 'Millstone', 'Altair', 'Millstone']
+    assert obs.unit == u.m
+
+
+@pytest.mark.parametrize('suffix', ['csv', 'npz'])
+@pytest.mark.parametrize('scale', ['utc', 'tdb'])
+def test_save_load(tmp_path, suffix, scale):
+    obs = _observations('range')
+    obs = Observations(getattr(obs.times, scale), obs.stations, obs.values, obs.weights, obs.kind)
+    file = tmp_path / f'observations.{suffix}'
+    obs.save(file)
+    back = Observations.load(file)
+
+    assert back.kind == 'range' and back.times.scale == scale
+    assert np.max(np.abs(back.epochs.seconds_from(obs.epochs.reference) - obs.epochs.seconds)) < 1e-6
+    assert list(back.stations) == list(obs.stations)
+    assert np.array_equal(back.values, obs.values) and np.array_equal(back.weights, obs.weights)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        Observations(START + [0, 1] * u.min, 'Altair', [1.0], kind='range')
+    with pytest.raises(ValueError):
+        Observations(START + [0] * u.min, 'Altair', [1.0], kind='azimuth')
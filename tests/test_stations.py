@@ -0,0 +1,43 @@
+"""Tests of the station geometry memo"""
+
+from astropy import units as u
+from astropy.time import Time
+
+import numpy as np
+
+from sim import stations
+from sim.stations import Station
+from sim.timeline import Timeline
+
+START = Time('1998-01-24 00:00:00', scale='utc')
+
+
+def _timeline(minutes):
+    return Timeline.from_time(START + np.arange(minutes)*u.min)
+
+
+def test_memo_bounded_by_bytes(monkeypatch):
+    station = Station("Test", 148.98*u.deg, -35.40*u.deg, 0.69*u.km)
+    timelines = [_timeline(n) for n in (10, 20, 30)]
+    monkeypatch.setattr(stations, 'GEOMETRY_BYTES', 48*(10 + 20))
+
+    for timeline in timelines:
+        station._posvel(timeline)
+    assert station._geometry_bytes <= stations.GEOMETRY_BYTES
+    assert list(station._geometry) == [timelines[2].key]
+
+    # a timeline beyond the limit on its own is computed but not memoized
+    station._posvel(_timeline(100))
+    assert list(station._geometry) == [timelines[2].key]
+
+    station.clear_cache()
+    assert not station._geometry and station._geometry_bytes == 0
+
+
+def test_memo_matches_direct():
+    station = Station("Test", 148.98*u.deg, -35.40*u.deg, 0.69*u.km)
+    timeline = _timeline(30)
+    memo = station._posvel(timeline)
+    station.clear_cache()
+    direct = station._posvel(timeline.to_time())
+    assert np.array_equal(memo[0], direct[0]) and np.array_equal(memo[1], direct[1])
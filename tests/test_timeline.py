@@ -0,0 +1,36 @@
+"""Tests of the float seconds timeline"""
+
+from astropy import units as u
+from astropy.time import Time
+
+import numpy as np
+
+from sim.timeline import Timeline
+
+EPOCHS = Time('1998-01-24 00:00:00', scale='utc') + np.arange(0, 3600, 60)*u.s
+
+
+def test_round_trip():
+    timeline = Timeline.from_time(EPOCHS)
+    assert timeline.to_time() is EPOCHS
+    back = Timeline(timeline.reference, timeline.seconds).to_time()
+    assert back.scale == 'utc'
+    assert np.max(np.abs((back - EPOCHS).to_value(u.s))) < 1e-6
+
+
+def test_key_distinguishes_scales():
+    utc, tdb = Timeline.from_time(EPOCHS), Timeline.from_time(EPOCHS.tdb)
+    assert np.allclose(utc.seconds, tdb.seconds)
+    assert utc.key != tdb.key
+    assert utc.key == Timeline.from_time(EPOCHS.copy()).key
+
+
+def test_seconds_from():
+    timeline = Timeline.from_time(EPOCHS[10:])
+    assert np.allclose(timeline.seconds_from(EPOCHS[0]), np.arange(600, 3600, 60))
+
+
+def test_getitem():
+    timeline = Timeline.from_time(EPOCHS)
+    assert len(timeline[5]) == 1
+    assert timeline[-1].to_time()[0] == EPOCHS[-1]
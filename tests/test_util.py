@@ -0,0 +1,75 @@
+"""Tests of the residual analysis helpers"""
+
+from astropy import units as u
+from astropy.time import Time
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+from sim.util import downsample, find_swings, plot_buckets, plot_residual
+
+matplotlib.use('Agg')
+
+START = Time('1998-01-24 00:00:00', scale='utc')
+
+
+def _bucket_extrema(values, x, buckets):
+    edges = np.linspace(x[0], x[-1], buckets+1)
+    bucket = np.clip(np.searchsorted(edges, x, side='right') - 1, 0, buckets-1)
+    for b in np.unique(bucket):
+        idx = np.flatnonzero(bucket == b)
+        yield idx[np.argmin(values[idx])], idx[np.argmax(values[idx])]
+
+
+def test_downsample_keeps_extrema_and_endpoints():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=10000)
+    kept = set(downsample(values, 100))
+
+    assert {0, len(values)-1} <= kept
+    for lo, hi in _bucket_extrema(values, np.arange(len(values)), 100):
+        assert lo in kept and hi in kept
+    assert len(kept) <= 2*100 + 2
+
+
+def test_downsample_buckets_by_span_of_irregular_epochs():
+    # a dense arc, a gap, and a sparse arc, as in tracking passes
+    x = np.concatenate((np.arange(9000.0), 50000 + 100*np.arange(1000.0)))
+    values = np.sin(x / 500)
+    kept = downsample(values, 50, x)
+
+    assert {0, len(x)-1} <= set(kept)
+    for lo, hi in _bucket_extrema(values, x, 50):
+        assert lo in kept and hi in kept
+    # the dense arc spans fewer than a tenth of the buckets, so keeps few samples
+    assert np.count_nonzero(kept < 9000) <= 2*10
+
+
+def test_downsample_short():
+    assert list(downsample([3, 1, 2], 10)) == [0, 1, 2]
+
+
+def test_plot_residual_thinned():
+    epochs = START + np.arange(20000)*u.s
+    residual = 1e-2*np.sin(np.arange(20000)/700) + 1e-3*np.cos(np.arange(20000)/3)
+
+    plot_residual(epochs, residual, None, 'mm/s')
+    ax = plt.gca()
+    x, y = ax.get_lines()[0].get_data()
+    plt.close('all')
+
+    assert len(x) == len(y) <= 2*plot_buckets(ax) + 2
+    assert np.isclose(np.min(y), 1e3*np.min(residual)) and np.isclose(np.max(y), 1e3*np.max(residual))
+
+
+def test_time_sequences():
+    epochs = START + np.arange(200)*u.min
+    residual = np.sin(np.arange(200)/10)
+
+    swings = find_swings(list(epochs), residual)
+    assert np.array_equal(swings[1], find_swings(epochs, residual)[1])
+
+    plot_residual(list(epochs), residual, None, 'mm/s')
+    assert len(plt.gca().get_lines()[0].get_xdata()) == 200
+    plt.close('all')